@@ -0,0 +1,83 @@
+import argparse
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from models.controller.manager.utils.sharded_vector_store import ShardedVectorStore
+
+
+def time_queries(search, queries):
+    """
+    Runs every query through ``search`` and returns the mean latency in milliseconds.
+
+    Args:
+        search (callable): Function taking a single query vector.
+        queries (np.ndarray): The query vectors.
+
+    Returns:
+        float: Mean latency per query in milliseconds.
+    """
+
+    search(queries[0])  # Warm up (loads shards into the cache)
+    start = time.perf_counter()
+    for query in queries:
+        search(query)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def run_benchmark(total_vectors, dim, shard_counts, num_queries, top_k, workers):
+    """
+    Compares a single flat index with a sharded store holding the same corpus,
+    for each shard count: fan-out across all shards and a single-tenant search.
+
+    Args:
+        total_vectors (int): Size of the whole corpus.
+        dim (int): Embedding dimension.
+        shard_counts (list[int]): Shard counts to benchmark.
+        num_queries (int): Number of queries timed per configuration.
+        top_k (int): Number of neighbours per query.
+        workers (int): Thread pool size for fan-out search.
+    """
+
+    rng = np.random.default_rng(0)
+    corpus = rng.random((total_vectors, dim), dtype=np.float32)
+    queries = rng.random((num_queries, dim), dtype=np.float32)
+
+    flat = faiss.IndexFlatL2(dim)
+    flat.add(corpus)
+    flat_ms = time_queries(lambda query: flat.search(query[None, :], top_k), queries)
+
+    print(f"corpus={total_vectors} dim={dim} top_k={top_k} workers={workers}")
+    print(f"single flat index: {flat_ms:.3f} ms/query\n")
+    print(f"{'shards':>6} {'fan-out all (ms)':>17} {'one tenant (ms)':>16}")
+
+    for shard_count in shard_counts:
+        with tempfile.TemporaryDirectory() as root_dir:
+            store = ShardedVectorStore(root_dir, embedding_dim=dim, max_workers=workers)
+            for shard_no, part in enumerate(np.array_split(corpus, shard_count)):
+                store.add_embeddings(f"tenant{shard_no}", part)
+
+            fan_out_ms = time_queries(
+                lambda query: store.search(query, top_k=top_k, all_tenants=True), queries
+            )
+            tenant_ms = time_queries(
+                lambda query: store.search(query, top_k=top_k, tenant_id="tenant0"), queries
+            )
+            store.close()
+
+        print(f"{shard_count:>6} {fan_out_ms:>17.3f} {tenant_ms:>16.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark search latency versus shard count.")
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    run_benchmark(args.vectors, args.dim, args.shards, args.queries, args.top_k, args.workers)
@@ -0,0 +1 @@
+# Lets pytest import the "models" package from this directory (tests/ is not a package).
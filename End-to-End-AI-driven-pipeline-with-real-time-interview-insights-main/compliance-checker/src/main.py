@@ -1,9 +1,11 @@
-from src.models.controllers.upload_controller import app as upload_app
-from src.models.controllers.ingestion_controller import extract_text_from_pdf
-from src.models.controllers.chunk_controller import chunk_text
-from src.models.controllers.embedding_controller import generate_embeddings
-from src.models.controllers.vector_controller import create_faiss_index, save_faiss_index
-from src.models.controllers.pinecone_controller import upsert_to_pinecone
+from src.models.controller.upload_controller import app as upload_app
+from src.models.controller.manager.ingestion_manager import extract_text_from_pdf
+from src.models.controller.chunk_controller import chunk_text
+from src.models.controller.embedding_controller import generate_embeddings
+from src.models.controller.manager.utils.vector_store_pinecone import PineconeVectorStore
+from src.models.controller.manager.utils.sharded_vector_store import (
+    DEFAULT_COLLECTION, DEFAULT_TENANT, ShardedVectorStore,
+)
 import os
 
 # PDF upload folder
@@ -14,17 +16,77 @@ FAISS_FOLDER = 'data/vector_store'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(FAISS_FOLDER, exist_ok=True)
 
-# Pinecone setup
+# Pinecone setup (each tenant/collection gets its own namespace)
 INDEX_NAME = "pdf-compliance-index"
 
-def process_pdf_pipeline(filepath, use_pinecone=False):
+# Stores are created on first use so importing this module touches no disk or network.
+_vector_store = None
+_pinecone_store = None
+
+
+def get_vector_store():
+    """
+    Returns the shared sharded FAISS store, creating it on first use.
+
+    One FAISS shard is kept per tenant/collection and shards are lazily loaded
+    under an LRU memory cap. A legacy FAISS_FOLDER/index.faiss is imported as
+    the "default/default" shard when the store is first created.
+
+    Returns:
+        ShardedVectorStore: The store rooted at FAISS_FOLDER.
+    """
+
+    global _vector_store
+    if _vector_store is None:
+        _vector_store = ShardedVectorStore(FAISS_FOLDER)
+    return _vector_store
+
+
+def get_pinecone_store():
+    """
+    Returns the shared Pinecone store, connecting to INDEX_NAME on first use.
+
+    Returns:
+        PineconeVectorStore: The store for INDEX_NAME.
+    """
+
+    global _pinecone_store
+    if _pinecone_store is None:
+        _pinecone_store = PineconeVectorStore(INDEX_NAME)
+    return _pinecone_store
+
+
+def pinecone_namespace(tenant_id, collection):
+    """
+    Maps a tenant/collection to its Pinecone namespace.
+
+    The default tenant/collection keeps using the "" namespace, which holds the
+    vectors written before namespaces were introduced.
+
+    Args:
+        tenant_id (str): The tenant id.
+        collection (str): The collection within the tenant.
+
+    Returns:
+        str: The namespace, "<tenant_id>/<collection>" or "" for the default shard.
+    """
+
+    shard_id = ShardedVectorStore.shard_id(tenant_id, collection)
+    if shard_id == ShardedVectorStore.shard_id(DEFAULT_TENANT, DEFAULT_COLLECTION):
+        return ""
+    return shard_id
+
+
+def process_pdf_pipeline(filepath, use_pinecone=False, tenant_id="default", collection="default"):
     """
     Processes a PDF file through the pipeline, extracting text, chunking,
-    generating embeddings, and storing them in Pinecone or a local FAISS index.
+    generating embeddings, and storing them in Pinecone or the tenant's local FAISS shard.
 
     Args:
         filepath (str): The path to the PDF file.
         use_pinecone (bool, optional): Whether to store embeddings in Pinecone. Defaults to False.
+        tenant_id (str, optional): The tenant the document belongs to. Defaults to "default".
+        collection (str, optional): The collection within the tenant. Defaults to "default".
     """
 
     print("\n--- Starting PDF Processing Pipeline ---\n")
@@ -45,15 +107,17 @@ def process_pdf_pipeline(filepath, use_pinecone=False):
     print("Embeddings generated.")
 
     # Step 4: Store embeddings
+    document_id = os.path.basename(filepath)
     if use_pinecone:
         print("[4/5] Upserting embeddings to Pinecone...")
-        upsert_to_pinecone(INDEX_NAME, embeddings, ids=range(len(chunks)))
+        ids = [f"{document_id}-{i}" for i in range(len(chunks))]
+        namespace = pinecone_namespace(tenant_id, collection)
+        get_pinecone_store().add_embeddings(ids, embeddings.tolist(), namespace=namespace)
         print("Embeddings uploaded to Pinecone.")
     else:
-        print("[4/5] Creating FAISS index...")
-        index = create_faiss_index(embeddings)
-        save_faiss_index(index, path=os.path.join(FAISS_FOLDER, "index.faiss"))  # Specify path
-        print("FAISS index saved locally.")
+        print(f"[4/5] Adding embeddings to FAISS shard {tenant_id}/{collection}...")
+        get_vector_store().add_embeddings(tenant_id, embeddings, collection=collection, document_id=document_id)
+        print("FAISS shard saved locally.")
 
     print("\n--- Pipeline Complete ---\n")
 
@@ -0,0 +1,483 @@
+import bisect
+import heapq
+import json
+import logging
+import numbers
+import os
+import re
+import shutil
+import threading
+import zlib
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+
+MANIFEST_NAME = "manifest.json"
+LEGACY_INDEX_NAME = "index.faiss"
+DEFAULT_TENANT = "default"
+DEFAULT_COLLECTION = "default"
+SHARD_LOCK_STRIPES = 64
+
+# Tenant ids and collections become directory and file names and are joined into
+# shard ids with "/", so only a strict set of characters is accepted.
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]*$")
+
+# A loaded shard: its FAISS index and the document ranges from its sidecar file.
+_Shard = namedtuple("_Shard", ["index", "documents"])
+
+
+class ShardedVectorStore:
+    """
+    Stores embeddings in one FAISS index per tenant/collection ("shard") on disk.
+
+    A JSON manifest in ``root_dir`` records every shard; each shard keeps the
+    document ranges of its vectors in a sidecar file next to it. Shards are loaded
+    lazily and kept in an LRU cache bounded by ``max_memory_bytes``; searches fan
+    out over the selected shards on a thread pool (FAISS releases the GIL while
+    searching) and the per-shard results are merged into a single top-k list.
+
+    Attributes:
+        root_dir (str): Directory holding the manifest and the shard files.
+        embedding_dim (int): The dimension (length) of each embedding vector.
+        metric (str): The distance metric of every shard ('L2' or 'cosine').
+        max_memory_bytes (int): Upper bound on the memory used by loaded shards.
+        manifest (dict): The shard manifest, keyed by shard id.
+    """
+
+    def __init__(self, root_dir: str = "data/vector_store", embedding_dim: int = 384,
+                 metric: str = "L2", max_memory_bytes: int = 512 * 1024 * 1024,
+                 max_workers: int = None):
+        """
+        Opens (or creates) a sharded store rooted at ``root_dir``.
+
+        A legacy single ``index.faiss`` found in ``root_dir`` is imported as the
+        "default/default" shard the first time the store is created.
+
+        Args:
+            root_dir (str, optional): Directory for the manifest and shard files.
+                Defaults to "data/vector_store".
+            embedding_dim (int, optional): Embedding dimension. Defaults to 384.
+            metric (str, optional): 'L2' or 'cosine'. Defaults to 'L2'.
+            max_memory_bytes (int, optional): Memory cap for loaded shards. Defaults to 512 MiB.
+            max_workers (int, optional): Threads used for fan-out search.
+                Defaults to the ThreadPoolExecutor default.
+
+        Raises:
+            ValueError: If the metric is invalid or does not match an existing
+                manifest or legacy index.
+        """
+
+        if metric not in ("L2", "cosine"):
+            raise ValueError("Invalid metric. Use 'L2' or 'cosine'.")
+
+        self.root_dir = root_dir
+        self.embedding_dim = embedding_dim
+        self.metric = metric
+        self.max_memory_bytes = max_memory_bytes
+        os.makedirs(root_dir, exist_ok=True)
+
+        self._manifest_path = os.path.join(root_dir, MANIFEST_NAME)
+        # Guards the in-memory manifest and cache only and is never held during disk I/O.
+        self._lock = threading.Lock()
+        # Serialises writes of the manifest file.
+        self._manifest_lock = threading.Lock()
+        # Striped per-shard locks serialising appends, drops and loads of one shard.
+        self._shard_locks = [threading.RLock() for _ in range(SHARD_LOCK_STRIPES)]
+        self._cache = OrderedDict()  # shard_id -> _Shard, least recently used first
+        self._cache_bytes = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, "r") as file:
+                data = json.load(file)
+            if data["embedding_dim"] != embedding_dim or data["metric"] != metric:
+                raise ValueError(
+                    f"Store at {root_dir} uses dim={data['embedding_dim']}, metric={data['metric']}."
+                )
+            self.manifest = data["shards"]
+            if os.path.exists(os.path.join(root_dir, LEGACY_INDEX_NAME)):
+                logging.warning(f"Ignoring legacy {LEGACY_INDEX_NAME} in {root_dir}; a manifest already exists.")
+        else:
+            self.manifest = {}
+            self._import_legacy_index()
+
+    @staticmethod
+    def shard_id(tenant_id: str, collection: str = DEFAULT_COLLECTION) -> str:
+        """
+        Builds the shard id for a tenant/collection pair.
+
+        Args:
+            tenant_id (str): The tenant (customer) id.
+            collection (str, optional): The collection within the tenant. Defaults to "default".
+
+        Returns:
+            str: The shard id, "<tenant_id>/<collection>".
+
+        Raises:
+            ValueError: If either part contains characters other than letters,
+                digits, "_", "-" and "." (or starts with ".").
+        """
+
+        for label, value in (("tenant id", tenant_id), ("collection", collection)):
+            if not isinstance(value, str) or not NAME_PATTERN.match(value):
+                raise ValueError(
+                    f"Invalid {label} {value!r}. Use letters, digits, '_', '-' and '.'."
+                )
+        return f"{tenant_id}/{collection}"
+
+    def list_shards(self, tenant_id: str = None) -> list:
+        """
+        Lists the shard ids in the manifest.
+
+        Args:
+            tenant_id (str, optional): Only list shards of this tenant. Defaults to all tenants.
+
+        Returns:
+            list: Sorted shard ids.
+        """
+
+        with self._lock:
+            return sorted(
+                shard_id for shard_id, entry in self.manifest.items()
+                if tenant_id is None or entry["tenant_id"] == tenant_id
+            )
+
+    def cache_info(self) -> dict:
+        """
+        Reports which shards are loaded and how much memory they use.
+
+        Returns:
+            dict: "shards" (loaded shard ids, least recently used first), "bytes"
+                and "max_bytes".
+        """
+
+        with self._lock:
+            return {
+                "shards": list(self._cache),
+                "bytes": self._cache_bytes,
+                "max_bytes": self.max_memory_bytes,
+            }
+
+    def add_embeddings(self, tenant_id: str, embeddings: list,
+                       collection: str = DEFAULT_COLLECTION, document_id: str = None) -> list:
+        """
+        Appends embeddings to a tenant's shard, creating the shard if needed,
+        and persists the shard, its document ranges and the manifest.
+
+        Args:
+            tenant_id (str): The tenant (customer) id.
+            embeddings (list): A list of embedding vectors.
+            collection (str, optional): The collection within the tenant. Defaults to "default".
+            document_id (str, optional): The source document of the vectors; recorded
+                so search hits can be traced back to it.
+
+        Returns:
+            list: The positions of the new vectors within the shard.
+
+        Raises:
+            ValueError: If the tenant id, collection or vectors are invalid.
+        """
+
+        shard_id = self.shard_id(tenant_id, collection)
+        vectors = self._prepare(embeddings)
+
+        with self._shard_lock(shard_id):
+            with self._lock:
+                entry = self.manifest.get(shard_id)
+            if entry is not None and (entry["tenant_id"], entry["collection"]) != (tenant_id, collection):
+                raise ValueError(f"Shard {shard_id} belongs to another tenant/collection.")
+
+            if entry is None:
+                entry = {
+                    "tenant_id": tenant_id,
+                    "collection": collection,
+                    "path": os.path.join(tenant_id, f"{collection}.faiss"),
+                    "num_vectors": 0,
+                }
+                index, documents = self._new_index(), []
+            else:
+                entry = dict(entry)
+                shard = self._get_shard(shard_id)
+                # Add to a copy so searches running on the cached index are unaffected.
+                index, documents = faiss.clone_index(shard.index), list(shard.documents)
+
+            start = index.ntotal
+            index.add(vectors)
+            documents.append({"document_id": document_id, "start": start, "end": index.ntotal})
+            self._write_index(index, entry["path"])
+            self._write_documents(documents, entry["path"])
+
+            entry["num_vectors"] = index.ntotal
+            with self._lock:
+                self.manifest[shard_id] = entry
+                self._uncache(shard_id)
+                self._cache_shard(shard_id, _Shard(index, documents))
+            self._save_manifest()
+
+        return list(range(start, start + len(vectors)))
+
+    def drop_shard(self, tenant_id: str, collection: str = DEFAULT_COLLECTION):
+        """
+        Removes a shard from the manifest, the cache and the disk.
+
+        Args:
+            tenant_id (str): The tenant (customer) id.
+            collection (str, optional): The collection within the tenant. Defaults to "default".
+        """
+
+        shard_id = self.shard_id(tenant_id, collection)
+        with self._shard_lock(shard_id):
+            with self._lock:
+                entry = self.manifest.pop(shard_id, None)
+                if entry is None:
+                    return
+                self._uncache(shard_id)
+            self._save_manifest()
+
+            for path in (entry["path"], self._documents_path(entry["path"])):
+                full_path = os.path.join(self.root_dir, path)
+                if os.path.exists(full_path):
+                    os.remove(full_path)
+
+    def search(self, query_vector: list, top_k: int = 5, tenant_id: str = None,
+               collections: list = None, shard_ids: list = None,
+               all_tenants: bool = False) -> list:
+        """
+        Searches the selected shards in parallel and merges their top-k results.
+
+        A search is scoped to one tenant: pass ``tenant_id`` (optionally narrowed to
+        ``collections``) and/or explicit ``shard_ids`` of that tenant. Searching every
+        tenant's shards requires ``all_tenants=True``. Shards dropped while the search
+        is running are skipped.
+
+        Args:
+            query_vector (list): The query vector to search with.
+            top_k (int, optional): The number of nearest neighbors to return. Defaults to 5.
+            tenant_id (str, optional): The tenant whose shards are searched.
+            collections (list, optional): Only search these collections of ``tenant_id``.
+            shard_ids (list, optional): Explicit shard ids to search.
+            all_tenants (bool, optional): Search every shard of every tenant. Defaults to False.
+
+        Returns:
+            list: Up to ``top_k`` dicts with keys "shard_id", "index" (position within
+                the shard), "distance", "document_id" and "chunk" (position within the
+                document), best match first.
+
+        Raises:
+            ValueError: If ``top_k`` is not a positive integer or the shard selection
+                is missing, ambiguous or spans tenants.
+            KeyError: If an explicit shard id is not in the manifest.
+        """
+
+        if isinstance(top_k, bool) or not isinstance(top_k, numbers.Integral) or top_k < 1:
+            raise ValueError("top_k must be a positive integer.")
+        top_k = int(top_k)
+
+        if all_tenants and (tenant_id is not None or collections is not None or shard_ids is not None):
+            raise ValueError("all_tenants cannot be combined with tenant_id, collections or shard_ids.")
+        if not all_tenants and tenant_id is None and shard_ids is None:
+            raise ValueError("Pass tenant_id or shard_ids, or all_tenants=True to search every tenant.")
+        if collections is not None and tenant_id is None:
+            raise ValueError("collections requires tenant_id.")
+
+        # Snapshot the selection so concurrent appends/drops cannot change it.
+        with self._lock:
+            if shard_ids is None:
+                selected = [
+                    shard_id for shard_id, entry in self.manifest.items()
+                    if (all_tenants or entry["tenant_id"] == tenant_id)
+                    and (collections is None or entry["collection"] in collections)
+                ]
+            else:
+                missing = [shard_id for shard_id in shard_ids if shard_id not in self.manifest]
+                if missing:
+                    raise KeyError(f"Unknown shards: {missing}")
+                tenants = {self.manifest[shard_id]["tenant_id"] for shard_id in shard_ids}
+                if len(tenants) > 1 or (tenant_id is not None and tenants - {tenant_id}):
+                    raise ValueError("shard_ids must all belong to one tenant (tenant_id, if given).")
+                selected = list(shard_ids)
+
+        if not selected:
+            return []
+
+        query = self._prepare([query_vector])
+        if len(selected) == 1:
+            per_shard = [self._search_shard(selected[0], query, top_k)]
+        else:
+            per_shard = list(self._executor.map(
+                lambda shard_id: self._search_shard(shard_id, query, top_k), selected
+            ))
+
+        hits = [hit for shard_hits in per_shard for hit in shard_hits]
+        if self.metric == "L2":
+            return heapq.nsmallest(top_k, hits, key=lambda hit: hit["distance"])
+        return heapq.nlargest(top_k, hits, key=lambda hit: hit["distance"])
+
+    def close(self):
+        """
+        Shuts down the search thread pool and drops all loaded shards.
+        """
+
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._cache.clear()
+            self._cache_bytes = 0
+
+    def _search_shard(self, shard_id: str, query, top_k: int) -> list:
+        try:
+            shard = self._get_shard(shard_id)
+        except KeyError:
+            return []  # Dropped after the selection was taken.
+
+        index, documents = shard
+        distances, indices = index.search(query, min(top_k, max(index.ntotal, 1)))
+        starts = [document["start"] for document in documents]
+        hits = []
+        for dist, idx in zip(distances[0], indices[0]):
+            if idx == -1:
+                continue
+            position = bisect.bisect_right(starts, idx) - 1
+            document = documents[position] if position >= 0 and idx < documents[position]["end"] else None
+            hits.append({
+                "shard_id": shard_id,
+                "index": int(idx),
+                "distance": float(dist),
+                "document_id": document["document_id"] if document else None,
+                "chunk": int(idx) - document["start"] if document else None,
+            })
+        return hits
+
+    def _get_shard(self, shard_id: str) -> _Shard:
+        with self._lock:
+            shard = self._cache.get(shard_id)
+            if shard is not None:
+                self._cache.move_to_end(shard_id)
+                return shard
+
+        # Loading under the shard lock never overlaps an append or drop of the same
+        # shard, and concurrent loaders of one shard read it from disk only once.
+        with self._shard_lock(shard_id):
+            with self._lock:
+                shard = self._cache.get(shard_id)
+                if shard is not None:
+                    self._cache.move_to_end(shard_id)
+                    return shard
+                entry = self.manifest.get(shard_id)
+            if entry is None:
+                raise KeyError(shard_id)
+
+            shard = _Shard(
+                faiss.read_index(os.path.join(self.root_dir, entry["path"])),
+                self._read_documents(entry["path"]),
+            )
+            with self._lock:
+                self._cache_shard(shard_id, shard)
+            return shard
+
+    def _shard_lock(self, shard_id: str):
+        return self._shard_locks[zlib.crc32(shard_id.encode()) % SHARD_LOCK_STRIPES]
+
+    def _cache_shard(self, shard_id: str, shard: _Shard):
+        self._cache[shard_id] = shard
+        self._cache_bytes += self._index_bytes(shard.index)
+        # Always keep the shard just requested, even if it alone exceeds the cap.
+        while self._cache_bytes > self.max_memory_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= self._index_bytes(evicted.index)
+
+    def _uncache(self, shard_id: str):
+        shard = self._cache.pop(shard_id, None)
+        if shard is not None:
+            self._cache_bytes -= self._index_bytes(shard.index)
+
+    def _index_bytes(self, index) -> int:
+        # Flat indexes hold ntotal float32 vectors of dimension d.
+        return index.ntotal * index.d * 4
+
+    def _new_index(self):
+        if self.metric == "L2":
+            return faiss.IndexFlatL2(self.embedding_dim)
+        return faiss.IndexFlatIP(self.embedding_dim)  # Inner Product (cosine similarity)
+
+    def _prepare(self, embeddings: list):
+        vectors = np.ascontiguousarray(np.array(embeddings).astype("float32"))
+        if vectors.ndim != 2 or vectors.shape[1] != self.embedding_dim:
+            raise ValueError(f"Expected vectors of dimension {self.embedding_dim}.")
+        if self.metric == "cosine":
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _documents_path(self, path: str) -> str:
+        return os.path.splitext(path)[0] + ".documents.json"
+
+    def _read_documents(self, path: str) -> list:
+        full_path = os.path.join(self.root_dir, self._documents_path(path))
+        if not os.path.exists(full_path):
+            return []
+        with open(full_path, "r") as file:
+            return json.load(file)
+
+    def _write_documents(self, documents: list, path: str):
+        full_path = os.path.join(self.root_dir, self._documents_path(path))
+        tmp_path = full_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(documents, file)
+        os.replace(tmp_path, full_path)
+
+    def _write_index(self, index, path: str):
+        # Write to a temp file first so a crash never leaves a truncated shard behind.
+        full_path = os.path.join(self.root_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        tmp_path = full_path + ".tmp"
+        faiss.write_index(index, tmp_path)
+        os.replace(tmp_path, full_path)
+
+    def _import_legacy_index(self):
+        legacy_path = os.path.join(self.root_dir, LEGACY_INDEX_NAME)
+        if not os.path.exists(legacy_path):
+            return
+
+        index = faiss.read_index(legacy_path)
+        expected_type = faiss.METRIC_L2 if self.metric == "L2" else faiss.METRIC_INNER_PRODUCT
+        if index.d != self.embedding_dim or index.metric_type != expected_type:
+            raise ValueError(
+                f"Legacy index {legacy_path} does not match dim={self.embedding_dim}, metric={self.metric}."
+            )
+
+        # Copy, record in the manifest, then delete: a crash at any point either
+        # leaves the legacy file to be imported again or a manifest that has it.
+        shard_id = self.shard_id(DEFAULT_TENANT, DEFAULT_COLLECTION)
+        path = os.path.join(DEFAULT_TENANT, f"{DEFAULT_COLLECTION}.faiss")
+        full_path = os.path.join(self.root_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        shutil.copyfile(legacy_path, full_path + ".tmp")
+        os.replace(full_path + ".tmp", full_path)
+        self._write_documents(
+            [{"document_id": LEGACY_INDEX_NAME, "start": 0, "end": index.ntotal}], path
+        )
+
+        self.manifest[shard_id] = {
+            "tenant_id": DEFAULT_TENANT,
+            "collection": DEFAULT_COLLECTION,
+            "path": path,
+            "num_vectors": index.ntotal,
+        }
+        self._save_manifest()
+        os.remove(legacy_path)
+        logging.info(f"Imported legacy {legacy_path} as shard {shard_id} ({index.ntotal} vectors).")
+
+    def _save_manifest(self):
+        # Snapshot while holding the write lock so the newest state is always written last.
+        with self._manifest_lock:
+            with self._lock:
+                data = {
+                    "embedding_dim": self.embedding_dim,
+                    "metric": self.metric,
+                    "shards": {shard_id: dict(entry) for shard_id, entry in self.manifest.items()},
+                }
+            tmp_path = self._manifest_path + ".tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(data, file, indent=2)
+            os.replace(tmp_path, self._manifest_path)
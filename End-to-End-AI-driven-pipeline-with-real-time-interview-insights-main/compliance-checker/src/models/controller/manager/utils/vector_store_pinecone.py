@@ -26,29 +26,31 @@ class PineconeVectorStore:
             pinecone.create_index(index_name, dimension=384, metric="cosine")  # Adjust metric as needed
         self.index = pinecone.Index(index_name)
 
-    def add_embeddings(self, ids: list[str], embeddings: list[list[float]]):
+    def add_embeddings(self, ids: list[str], embeddings: list[list[float]], namespace: str = ""):
         """
         Adds embeddings to the Pinecone index.
 
         Args:
             ids (list[str]): A list of IDs for the embeddings.
             embeddings (list[list[float]]): A list of embedding vectors.
+            namespace (str, optional): The namespace (e.g. "<tenant>/<collection>") to write to. Defaults to "".
         """
 
-        vectors = [{"id": id_, "vector": embedding} for id_, embedding in zip(ids, embeddings)]
-        self.index.upsert(vectors=vectors)
+        vectors = [{"id": id_, "values": embedding} for id_, embedding in zip(ids, embeddings)]
+        self.index.upsert(vectors=vectors, namespace=namespace)
 
-    def search(self, query_vector: list[float], top_k: int = 5) -> list:
+    def search(self, query_vector: list[float], top_k: int = 5, namespace: str = "") -> list:
         """
         Searches the index for the top-k nearest neighbors to the query vector.
 
         Args:
             query_vector (list[float]): The query vector.
             top_k (int, optional): The number of nearest neighbors to return. Defaults to 5.
+            namespace (str, optional): The namespace (e.g. "<tenant>/<collection>") to search. Defaults to "".
 
         Returns:
             list: A list of tuples, where each tuple contains the ID, score, and metadata of a nearest neighbor.
         """
 
-        query_results = self.index.query(vector=query_vector, top_k=top_k)
+        query_results = self.index.query(vector=query_vector, top_k=top_k, namespace=namespace)
         return query_results["matches"]
\ No newline at end of file
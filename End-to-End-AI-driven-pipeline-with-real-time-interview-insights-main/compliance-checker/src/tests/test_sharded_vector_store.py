@@ -0,0 +1,243 @@
+import os
+import threading
+
+import faiss
+import numpy as np
+import pytest
+
+from models.controller.manager.utils.sharded_vector_store import ShardedVectorStore
+
+DIM = 16
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).random((400, DIM), dtype=np.float32)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ShardedVectorStore(str(tmp_path), embedding_dim=DIM, max_workers=4)
+    yield store
+    store.close()
+
+
+def test_tenants_are_isolated(store, vectors):
+    store.add_embeddings("acme", vectors[:10])
+    store.add_embeddings("globex", vectors[10:20])
+
+    hits = store.search(vectors[15], top_k=10, tenant_id="acme")
+
+    assert {hit["shard_id"] for hit in hits} == {"acme/default"}
+    assert store.list_shards("acme") == ["acme/default"]
+    assert store.list_shards("globex") == ["globex/default"]
+
+
+def test_search_requires_a_tenant_scope(store, vectors):
+    store.add_embeddings("acme", vectors[:10])
+    store.add_embeddings("globex", vectors[10:20])
+
+    with pytest.raises(ValueError):
+        store.search(vectors[0])
+    with pytest.raises(ValueError):
+        store.search(vectors[0], collections=["default"])
+    with pytest.raises(ValueError):
+        store.search(vectors[0], tenant_id="acme", shard_ids=["globex/default"])
+    with pytest.raises(ValueError):
+        store.search(vectors[0], shard_ids=["acme/default", "globex/default"])
+
+    hits = store.search(vectors[0], top_k=20, all_tenants=True)
+    assert {hit["shard_id"] for hit in hits} == {"acme/default", "globex/default"}
+
+
+@pytest.mark.parametrize("tenant_id, collection", [
+    ("a/b", "c"), ("a", "b/c"), ("..", "docs"), ("acme", ""), ("acme", ".hidden"),
+])
+def test_invalid_names_are_rejected(store, vectors, tenant_id, collection):
+    with pytest.raises(ValueError):
+        store.add_embeddings(tenant_id, vectors[:2], collection=collection)
+    assert store.list_shards() == []
+
+
+@pytest.mark.parametrize("metric", ["L2", "cosine"])
+def test_merged_top_k_matches_flat_index(tmp_path, vectors, metric):
+    store = ShardedVectorStore(str(tmp_path), embedding_dim=DIM, metric=metric)
+    for shard_no, part in enumerate(np.array_split(vectors, 5)):
+        store.add_embeddings(f"tenant{shard_no}", part)
+
+    corpus = vectors.copy()
+    if metric == "cosine":
+        faiss.normalize_L2(corpus)
+        flat = faiss.IndexFlatIP(DIM)
+    else:
+        flat = faiss.IndexFlatL2(DIM)
+    flat.add(corpus)
+
+    query = np.random.default_rng(1).random(DIM, dtype=np.float32)
+    flat_query = query[None, :].copy()
+    if metric == "cosine":
+        faiss.normalize_L2(flat_query)
+    distances, _ = flat.search(flat_query, 10)
+
+    hits = store.search(query, top_k=10, all_tenants=True)
+    store.close()
+
+    np.testing.assert_allclose([hit["distance"] for hit in hits], distances[0], rtol=1e-5)
+
+
+def test_lru_eviction_respects_memory_cap(tmp_path, vectors):
+    shard_bytes = 100 * DIM * 4
+    store = ShardedVectorStore(str(tmp_path), embedding_dim=DIM, max_memory_bytes=2 * shard_bytes)
+    for shard_no in range(4):
+        store.add_embeddings(f"tenant{shard_no}", vectors[shard_no * 100:(shard_no + 1) * 100])
+
+    assert store.cache_info()["shards"] == ["tenant2/default", "tenant3/default"]
+
+    store.search(vectors[0], tenant_id="tenant0")
+    store.search(vectors[0], tenant_id="tenant3")
+
+    info = store.cache_info()
+    store.close()
+    assert info["shards"] == ["tenant0/default", "tenant3/default"]
+    assert info["bytes"] == 2 * shard_bytes <= info["max_bytes"]
+
+
+def test_reopen_from_manifest(tmp_path, vectors):
+    store = ShardedVectorStore(str(tmp_path), embedding_dim=DIM)
+    store.add_embeddings("acme", vectors[:10], collection="contracts", document_id="a.pdf")
+    store.add_embeddings("acme", vectors[10:20], collection="contracts", document_id="b.pdf")
+    store.close()
+
+    reopened = ShardedVectorStore(str(tmp_path), embedding_dim=DIM)
+    hit = reopened.search(vectors[13], top_k=1, tenant_id="acme", collections=["contracts"])[0]
+    reopened.close()
+
+    assert reopened.list_shards() == ["acme/contracts"]
+    assert (hit["index"], hit["document_id"], hit["chunk"]) == (13, "b.pdf", 3)
+
+
+@pytest.mark.parametrize("embedding_dim, metric", [(DIM + 1, "L2"), (DIM, "cosine")])
+def test_manifest_mismatch_raises(tmp_path, vectors, embedding_dim, metric):
+    ShardedVectorStore(str(tmp_path), embedding_dim=DIM).add_embeddings("acme", vectors[:2])
+
+    with pytest.raises(ValueError):
+        ShardedVectorStore(str(tmp_path), embedding_dim=embedding_dim, metric=metric)
+
+
+def test_drop_shard(store, vectors, tmp_path):
+    store.add_embeddings("acme", vectors[:10])
+    store.add_embeddings("globex", vectors[10:20])
+
+    store.drop_shard("acme")
+
+    assert store.list_shards() == ["globex/default"]
+    assert os.listdir(tmp_path / "acme") == []
+    hits = store.search(vectors[0], top_k=5, all_tenants=True)
+    assert {hit["shard_id"] for hit in hits} == {"globex/default"}
+    with pytest.raises(KeyError):
+        store.search(vectors[0], shard_ids=["acme/default"])
+
+
+@pytest.mark.parametrize("top_k", [0, -1, True, 2.0])
+def test_invalid_top_k_raises(store, vectors, top_k):
+    store.add_embeddings("acme", vectors[:10])
+
+    with pytest.raises(ValueError):
+        store.search(vectors[0], top_k=top_k, tenant_id="acme")
+
+
+def test_numpy_top_k_is_accepted(store, vectors):
+    store.add_embeddings("acme", vectors[:10])
+
+    assert len(store.search(vectors[0], top_k=np.int64(3), tenant_id="acme")) == 3
+
+
+def test_legacy_index_is_imported(tmp_path, vectors):
+    legacy = faiss.IndexFlatL2(DIM)
+    legacy.add(vectors[:10])
+    faiss.write_index(legacy, str(tmp_path / "index.faiss"))
+
+    store = ShardedVectorStore(str(tmp_path), embedding_dim=DIM)
+    hit = store.search(vectors[4], top_k=1, tenant_id="default")[0]
+    store.close()
+
+    assert not os.path.exists(tmp_path / "index.faiss")
+    assert (hit["shard_id"], hit["index"], hit["document_id"]) == ("default/default", 4, "index.faiss")
+
+
+def test_interrupted_legacy_import_is_redone(tmp_path, vectors):
+    legacy = faiss.IndexFlatL2(DIM)
+    legacy.add(vectors[:10])
+    faiss.write_index(legacy, str(tmp_path / "index.faiss"))
+    # Simulate a crash after the shard file was copied but before the manifest was saved.
+    os.makedirs(tmp_path / "default")
+    faiss.write_index(legacy, str(tmp_path / "default" / "default.faiss"))
+
+    store = ShardedVectorStore(str(tmp_path), embedding_dim=DIM)
+    store.add_embeddings("default", vectors[10:12], document_id="new.pdf")
+    store.close()
+
+    assert store.manifest["default/default"]["num_vectors"] == 12
+
+
+def test_concurrent_appends_searches_and_drops_stay_consistent(tmp_path, vectors):
+    store = ShardedVectorStore(str(tmp_path), embedding_dim=DIM, max_workers=4)
+    store.add_embeddings("acme", vectors[:5], document_id="doc0")
+    for shard_no in range(4):
+        store.add_embeddings("globex", vectors[300:310], collection=f"c{shard_no}")
+    errors = []
+
+    def run(target):
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+
+    def append(worker):
+        for batch in range(worker + 1, 40, 4):
+            store.add_embeddings("acme", vectors[batch * 5:(batch + 1) * 5], document_id=f"doc{batch}")
+
+    def search():
+        for _ in range(100):
+            store.search(vectors[0], top_k=5, tenant_id="acme")
+            store.search(vectors[0], top_k=5, tenant_id="globex")
+
+    def drop():
+        for shard_no in range(4):
+            store.drop_shard("globex", collection=f"c{shard_no}")
+
+    threads = [
+        threading.Thread(target=run, args=(lambda worker=worker: append(worker),))
+        for worker in range(4)
+    ]
+    threads += [threading.Thread(target=run, args=(search,)) for _ in range(4)]
+    threads.append(threading.Thread(target=run, args=(drop,)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+
+    assert errors == []
+    assert store.list_shards() == ["acme/default"]
+    assert store.manifest["acme/default"]["num_vectors"] == 200
+
+    # Concurrent first loads of the reopened shard must load and count it once.
+    reopened = ShardedVectorStore(str(tmp_path), embedding_dim=DIM, max_workers=4)
+    results = {}
+    loaders = [
+        threading.Thread(target=lambda batch=batch: results.update(
+            {batch: reopened.search(vectors[batch * 5 + 2], top_k=1, tenant_id="acme")[0]}
+        ))
+        for batch in range(40)
+    ]
+    for thread in loaders:
+        thread.start()
+    for thread in loaders:
+        thread.join()
+    info = reopened.cache_info()
+    reopened.close()
+
+    assert info["shards"] == ["acme/default"]
+    assert info["bytes"] == 200 * DIM * 4
+    assert all((hit["document_id"], hit["chunk"]) == (f"doc{batch}", 2) for batch, hit in results.items())